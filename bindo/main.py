@@ -12,10 +12,10 @@ from .server import Server
 
 class Client(threading.Thread):
 
-    def __init__(self, username: str, password: str) -> None:
+    def __init__(self, username: str, password: str, listen_port: int = 2234) -> None:
         self.server_address = 'server.slsknet.org'
         self.server_port = 2242
-        self.listen_port = 2234
+        self.listen_port = listen_port
 
         self.username = username
         self.password = password
@@ -40,14 +40,18 @@ class Client(threading.Thread):
 
         while True:
             message = self.outgoing_messages.get(block=True)
-            if message.get('recipient') == self.server:
-                self.server.send(message['message'])
-                time.sleep(0.05)  # TODO: Remove maybe.
-            else:
-                token = message.get('recipient')
-                print(f'[CLIENT]: Sending message to peer (token={token}).')
-                peer = self.peers.get(token)
-                peer.send(message.get('message'))
+            try:
+                if message.get('recipient') == self.server:
+                    self.server.send(message['message'])
+                    time.sleep(0.05)  # TODO: Remove maybe.
+                else:
+                    token = message.get('recipient')
+                    print(f'[CLIENT]: Sending message to peer (token={token}).')
+                    peer = self.peers.get(token)
+                    peer.send(message.get('message'))
+            finally:
+                # Lets outgoing_messages.join() wait until everything is sent.
+                self.outgoing_messages.task_done()
 
     def handle_message(self, message: Dict[str, Union[str, int]]) -> None:
         if message.get('code') == 1:
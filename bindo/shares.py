@@ -0,0 +1,60 @@
+"""This module provides API for diffing successive share listings of a user."""
+from typing import Dict, List, Union
+
+
+class SharesIndex(object):
+    """This class keeps the last share listing of every browsed user.
+
+    Every directory is stored as a {name: size} dict of its files. When a user
+    is browsed again, directories whose dict compares equal to the stored one
+    are skipped, and only the changed ones are diffed file by file.
+    """
+
+    def __init__(self) -> None:
+        self.listings = {}
+
+    @staticmethod
+    def index_listing(dirs: List[Dict]) -> Dict[str, Dict[str, int]]:
+        return {
+            directory["name"]: {file["name"]: file["size"] for file in directory["files"]}
+            for directory in dirs
+        }
+
+    def update(self, username: str, dirs: List[Dict]) -> Dict[str, List[Dict[str, Union[str, int]]]]:
+        """Store a new listing of the user and return what changed.
+
+        `dirs` is the listing as returned by `SharesReply.unpack_message`.
+        Files are reported as {"dir": ..., "name": ..., "size": ...}; on the
+        first browse of a user every file is reported as added.
+        """
+        new = self.index_listing(dirs)
+        old = self.listings.get(username, {})
+        self.listings[username] = new
+
+        added = []
+        removed = []
+        modified = []
+        for dir_name, files in new.items():
+            old_files = old.get(dir_name)
+            if old_files is None:
+                added.extend(self.describe(dir_name, files, files))
+                continue
+            if files == old_files:
+                continue
+            added.extend(self.describe(dir_name, files, files.keys() - old_files.keys()))
+            removed.extend(self.describe(dir_name, old_files, old_files.keys() - files.keys()))
+            modified.extend(self.describe(
+                dir_name, files,
+                (name for name in files.keys() & old_files.keys() if files[name] != old_files[name])
+            ))
+        for dir_name, old_files in old.items():
+            if dir_name not in new:
+                removed.extend(self.describe(dir_name, old_files, old_files))
+        return {"added": added, "removed": removed, "modified": modified}
+
+    def forget(self, username: str) -> None:
+        self.listings.pop(username, None)
+
+    @staticmethod
+    def describe(dir_name: str, files: Dict[str, int], names) -> List[Dict[str, Union[str, int]]]:
+        return [{"dir": dir_name, "name": name, "size": files[name]} for name in sorted(names)]
@@ -0,0 +1,232 @@
+"""This module provides API for running several clients in worker processes."""
+import collections
+import multiprocessing
+import sys
+import threading
+import time
+import zlib
+from queue import Empty
+from typing import Dict, List, Tuple, Union
+
+from .main import Client
+from .shares import SharesIndex
+
+# How long a peer message waits for its peer to connect, in seconds.
+PEER_TIMEOUT = 2
+
+
+class WorkerClient(Client):
+    """This class represents a client running inside a worker process.
+
+    Every message received from the server or from a peer is also put on the
+    results queue, so the supervisor gets it back in the parent process.
+    """
+
+    def __init__(self, username: str, password: str, listen_port: int,
+                 results: multiprocessing.Queue) -> None:
+        # Set before Client.__init__, which already starts the server thread.
+        self.results = results
+        self.logged_in = threading.Event()
+        super().__init__(username, password, listen_port)
+
+    def handle_message(self, message: Dict[str, Union[str, int]]) -> None:
+        super().handle_message(message)
+        if message.get('code') == 1:
+            self.logged_in.set()
+        self.results.put({
+            "account": self.username,
+            "source": "server",
+            "message": message
+        })
+
+    def handle_peer(self, message: Dict[str, Union[str, int]], token: int) -> None:
+        super().handle_peer(message, token)
+        self.results.put({
+            "account": self.username,
+            "source": "peer",
+            "token": token,
+            "message": message
+        })
+
+    def running(self) -> bool:
+        # A failed login raises in the server thread, so check it as well.
+        return self.is_alive() and self.server.is_alive()
+
+    def send_waiting(self, waiting: List[Tuple]) -> List[Tuple]:
+        """Send the peer messages whose peer has connected by now.
+
+        Returns the ones that still wait. Those past their deadline are
+        reported as unsent instead.
+        """
+        still_waiting = []
+        for (deadline, token, message_code, kwargs) in waiting:
+            if self.connection_established(token):
+                self.peer_message(token, message_code, **kwargs)
+            elif time.monotonic() < deadline:
+                still_waiting.append((deadline, token, message_code, kwargs))
+            else:
+                self.results.put({
+                    "account": self.username,
+                    "source": "worker",
+                    "token": token,
+                    "message": {"code": "unsent", "message_code": message_code}
+                })
+        return still_waiting
+
+
+def run_worker(username: str, password: str, listen_port: int,
+               queue: multiprocessing.Queue, results: multiprocessing.Queue,
+               ready: multiprocessing.Event) -> None:
+    client = WorkerClient(username, password, listen_port, results)
+    client.daemon = True
+    client.start()
+
+    # Exiting is how the supervisor learns that the client is gone.
+    while not client.logged_in.wait(0.1):
+        if not client.running():
+            sys.exit(1)
+    ready.set()
+
+    # Peer messages wait here until their peer connects, so a slow peer
+    # doesn't hold up the rest of the work of this worker.
+    waiting = []
+    stopping = False
+    while not stopping or waiting:
+        if not client.running():
+            sys.exit(1)
+        try:
+            work = queue.get(block=True, timeout=0.1)
+        except Empty:
+            work = ()
+        # None is sent by the supervisor to stop the worker.
+        if work is None:
+            stopping = True
+        elif work:
+            (recipient, token, message_code, kwargs) = work
+            if recipient == 'server':
+                client.server_message(message_code, **kwargs)
+            else:
+                deadline = time.monotonic() + PEER_TIMEOUT
+                waiting.append((deadline, token, message_code, kwargs))
+        waiting = client.send_waiting(waiting)
+
+    # The client threads are daemons and die with this process, so wait until
+    # everything queued so far is sent.
+    while client.outgoing_messages.unfinished_tasks:
+        if not client.running():
+            sys.exit(1)
+        time.sleep(0.05)
+
+
+class Supervisor(object):
+    """This class runs one `Client` session per account in its own process.
+
+    Work addressed to a user is always routed to the same worker, chosen by a
+    hash of the username, so every worker keeps its own peers. Messages the
+    workers receive come back through `get_result`.
+    """
+
+    def __init__(self, accounts: List[Tuple[str, str]], listen_port: int = 2234) -> None:
+        if not accounts:
+            raise ValueError('At least one account is required.')
+        self.accounts = [username for (username, _) in accounts]
+        self.results = multiprocessing.Queue()
+        self.pending = collections.deque()
+        self.shares = SharesIndex()
+        self.peer_usernames = {}
+        self.queues = []
+        self.ready = []
+        self.workers = []
+        for (index, (username, password)) in enumerate(accounts):
+            queue = multiprocessing.Queue()
+            ready = multiprocessing.Event()
+            # Every worker needs its own port to listen for peers on.
+            worker = multiprocessing.Process(
+                target=run_worker,
+                args=(username, password, listen_port + index, queue, self.results, ready),
+                daemon=True
+            )
+            self.queues.append(queue)
+            self.ready.append(ready)
+            self.workers.append(worker)
+
+    def start(self) -> None:
+        for worker in self.workers:
+            worker.start()
+        # Wait until every client is logged in, or fail if one of them died.
+        for (index, ready) in enumerate(self.ready):
+            while not ready.wait(0.1):
+                self.drain_results()
+                self.check_worker(index)
+
+    def stop(self) -> None:
+        for queue in self.queues:
+            queue.put(None)
+        for worker in self.workers:
+            # A worker can't exit before its results are read from the pipe,
+            # so keep reading them while waiting.
+            while worker.is_alive():
+                self.drain_results()
+                worker.join(0.1)
+        self.drain_results()
+
+    def drain_results(self) -> None:
+        while not self.results.empty():
+            self.pending.append(self.results.get())
+
+    def check_worker(self, index: int) -> None:
+        worker = self.workers[index]
+        if not worker.is_alive():
+            raise RuntimeError(
+                f'Worker for {self.accounts[index]} is not running (exitcode={worker.exitcode}).'
+            )
+
+    def shard(self, username: str) -> int:
+        # crc32 rather than hash(), which is salted differently per process.
+        return zlib.crc32(bytes(username, 'utf-8')) % len(self.queues)
+
+    def dispatch(self, username: str, work: Tuple) -> str:
+        index = self.shard(username)
+        self.check_worker(index)
+        self.queues[index].put(work)
+        return self.accounts[index]
+
+    def submit(self, username: str, message_code: int, /, **kwargs: Dict[str, Union[str, int]]) -> None:
+        """Send a server message from the worker responsible for `username`.
+
+        The arguments are positional-only, since messages like GetPeerAddress
+        take a `username` keyword of their own.
+        """
+        account = self.dispatch(username, ('server', None, message_code, kwargs))
+        # The peer answers ConnectToPeer by connecting to us with this token,
+        # that's the only place we learn who is behind it.
+        if message_code == 18:
+            self.peer_usernames[(account, kwargs['token'])] = kwargs['username']
+
+    def submit_peer(self, username: str, token: int, message_code: int, /,
+                    **kwargs: Dict[str, Union[str, int]]) -> None:
+        """Send a peer message, e.g. a SharesRequest, to the peer `username`.
+
+        `token` is the one sent to the peer with ConnectToPeer through
+        `submit`. If the peer doesn't connect in time, a result with the
+        "unsent" code is returned by `get_result` instead.
+        """
+        self.dispatch(username, ('peer', token, message_code, kwargs))
+
+    def get_result(self, timeout: float = None) -> Dict:
+        """Return the next message received by any of the workers.
+
+        Raises `queue.Empty` if nothing arrives within `timeout`. A SharesReply
+        from a known user also gets a "delta" against the previous listing.
+        """
+        if self.pending:
+            result = self.pending.popleft()
+        else:
+            result = self.results.get(block=True, timeout=timeout)
+        message = result["message"]
+        if result["source"] != "peer":
+            return result
+        result["username"] = self.peer_usernames.get((result["account"], result["token"]))
+        if message.get("code") == 5 and result["username"]:
+            result["delta"] = self.shares.update(result["username"], message["dirs"])
+        return result
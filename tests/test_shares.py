@@ -0,0 +1,70 @@
+import unittest
+
+from bindo.shares import SharesIndex
+
+
+def listing(**dirs):
+    return [
+        {"name": name, "files": [{"name": file, "size": size} for (file, size) in files]}
+        for (name, files) in dirs.items()
+    ]
+
+
+class SharesIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SharesIndex()
+        self.index.update('user', listing(a=[('x', 1), ('y', 2)], b=[('z', 3)]))
+
+    def test_first_browse_reports_every_file_as_added(self):
+        delta = SharesIndex().update('user', listing(a=[('x', 1)], b=[('z', 3)]))
+        self.assertEqual(delta, {
+            "added": [
+                {"dir": "a", "name": "x", "size": 1},
+                {"dir": "b", "name": "z", "size": 3}
+            ],
+            "removed": [],
+            "modified": []
+        })
+
+    def test_unchanged_listing_reports_nothing(self):
+        delta = self.index.update('user', listing(b=[('z', 3)], a=[('y', 2), ('x', 1)]))
+        self.assertEqual(delta, {"added": [], "removed": [], "modified": []})
+
+    def test_changed_directory_reports_added_removed_and_modified(self):
+        delta = self.index.update('user', listing(a=[('x', 5), ('w', 4)], b=[('z', 3)]))
+        self.assertEqual(delta, {
+            "added": [{"dir": "a", "name": "w", "size": 4}],
+            "removed": [{"dir": "a", "name": "y", "size": 2}],
+            "modified": [{"dir": "a", "name": "x", "size": 5}]
+        })
+
+    def test_removed_directory_reports_its_files_as_removed(self):
+        delta = self.index.update('user', listing(a=[('x', 1), ('y', 2)]))
+        self.assertEqual(delta, {
+            "added": [],
+            "removed": [{"dir": "b", "name": "z", "size": 3}],
+            "modified": []
+        })
+
+    def test_added_directory_reports_its_files_as_added(self):
+        delta = self.index.update('user', listing(a=[('x', 1), ('y', 2)], b=[('z', 3)], c=[('v', 7)]))
+        self.assertEqual(delta, {
+            "added": [{"dir": "c", "name": "v", "size": 7}],
+            "removed": [],
+            "modified": []
+        })
+
+    def test_users_are_tracked_separately(self):
+        delta = self.index.update('other', listing(a=[('x', 1)]))
+        self.assertEqual(delta["added"], [{"dir": "a", "name": "x", "size": 1}])
+
+    def test_forget_makes_next_browse_a_first_browse(self):
+        self.index.forget('user')
+        delta = self.index.update('user', listing(b=[('z', 3)]))
+        self.assertEqual(delta["added"], [{"dir": "b", "name": "z", "size": 3}])
+        self.assertEqual(delta["removed"], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
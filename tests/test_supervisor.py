@@ -0,0 +1,199 @@
+import multiprocessing
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+from bindo.supervisor import Supervisor, WorkerClient, run_worker
+
+
+class FakeClient(threading.Thread):
+    """Stands in for WorkerClient, sending queued messages slowly."""
+
+    def __init__(self, username, password, listen_port, results) -> None:
+        self.username = username
+        self.results = results
+        self.outgoing_messages = queue.Queue()
+        self.logged_in = threading.Event()
+        self.logged_in.set()
+        self.connected = set()
+        self.sent = []
+        FakeClient.instance = self
+        super().__init__()
+
+    def run(self) -> None:
+        while True:
+            message = self.outgoing_messages.get(block=True)
+            time.sleep(0.05)
+            self.sent.append(message)
+            self.outgoing_messages.task_done()
+
+    def running(self) -> bool:
+        return self.is_alive()
+
+    def server_message(self, message_code, **kwargs) -> None:
+        self.outgoing_messages.put(('server', message_code, kwargs))
+
+    def peer_message(self, token, message_code, **kwargs) -> None:
+        self.outgoing_messages.put((token, message_code, kwargs))
+
+    def connection_established(self, token) -> bool:
+        return token in self.connected
+
+    send_waiting = WorkerClient.send_waiting
+
+
+class FailedLoginClient(FakeClient):
+    """Never logs in, and its thread dies right away."""
+
+    def __init__(self, *args) -> None:
+        super().__init__(*args)
+        self.logged_in.clear()
+
+    def run(self) -> None:
+        pass
+
+
+class DyingClient(FakeClient):
+    """Logs in, then dies on the first message it sends."""
+
+    def run(self) -> None:
+        self.outgoing_messages.get(block=True)
+
+
+ACCOUNTS = [('a', 'x'), ('b', 'y'), ('c', 'z')]
+USERNAMES = ['alice', 'bob', 'carol', 'dave', 'eve', 'ünïcode']
+
+
+class SupervisorTest(unittest.TestCase):
+
+    def test_shard_is_in_range(self):
+        supervisor = Supervisor(ACCOUNTS)
+        for username in USERNAMES:
+            self.assertIn(supervisor.shard(username), range(len(ACCOUNTS)))
+
+    def test_shard_is_stable_across_processes(self):
+        supervisor = Supervisor(ACCOUNTS)
+        expected = [supervisor.shard(username) for username in USERNAMES]
+        code = (
+            'from bindo.supervisor import Supervisor;'
+            f'supervisor = Supervisor({ACCOUNTS!r});'
+            f'print([supervisor.shard(username) for username in {USERNAMES!r}])'
+        )
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        for seed in ('1', '2'):
+            env = dict(os.environ, PYTHONHASHSEED=seed, PYTHONIOENCODING='utf-8')
+            output = subprocess.check_output([sys.executable, '-c', code], cwd=root, env=env)
+            self.assertEqual(output.decode().strip(), repr(expected))
+
+    def test_no_accounts_is_rejected(self):
+        with self.assertRaises(ValueError):
+            Supervisor([])
+
+    def test_submit_to_worker_not_running_raises(self):
+        supervisor = Supervisor(ACCOUNTS)
+        with self.assertRaises(RuntimeError):
+            supervisor.submit('alice', 3, username='alice')
+
+    def test_browse_result_gets_delta(self):
+        supervisor = Supervisor(ACCOUNTS)
+        dirs = [{"name": "a", "files": [{"name": "x", "size": 1}]}]
+        with mock.patch.object(supervisor, 'check_worker'):
+            supervisor.submit('alice', 18, token=7, username='alice', type='P')
+            supervisor.submit_peer('alice', 7, 4)
+        account = supervisor.accounts[supervisor.shard('alice')]
+        # The peer connects with the token of our ConnectToPeer and replies.
+        supervisor.pending.append({
+            "account": account,
+            "source": "peer",
+            "token": 7,
+            "message": {"code": 5, "dirs": dirs}
+        })
+        result = supervisor.get_result()
+        self.assertEqual(result["username"], "alice")
+        self.assertEqual(result["delta"]["added"], [{"dir": "a", "name": "x", "size": 1}])
+
+    def test_token_of_another_account_is_not_mapped(self):
+        supervisor = Supervisor(ACCOUNTS)
+        with mock.patch.object(supervisor, 'check_worker'):
+            supervisor.submit('alice', 18, token=7, username='alice', type='P')
+        other = next(account for account in supervisor.accounts
+                     if account != supervisor.accounts[supervisor.shard('alice')])
+        supervisor.pending.append({
+            "account": other,
+            "source": "peer",
+            "token": 7,
+            "message": {"code": 5, "dirs": []}
+        })
+        result = supervisor.get_result()
+        self.assertIsNone(result["username"])
+        self.assertNotIn("delta", result)
+
+    def test_worker_sends_queued_messages_before_exiting(self):
+        work = queue.Queue()
+        for status in range(5):
+            work.put(('server', None, 28, {"status": status}))
+        work.put(None)
+        with mock.patch('bindo.supervisor.WorkerClient', FakeClient):
+            run_worker('a', 'x', 2234, work, None, threading.Event())
+        self.assertEqual(
+            FakeClient.instance.sent,
+            [('server', 28, {"status": status}) for status in range(5)]
+        )
+
+    def test_waiting_peer_does_not_block_server_messages(self):
+        work = queue.Queue()
+        work.put(('peer', 7, 4, {}))
+        work.put(('server', None, 28, {"status": 2}))
+        work.put(None)
+        with mock.patch('bindo.supervisor.WorkerClient', FakeClient):
+            # The peer connects only after the server message is handled.
+            threading.Timer(0.5, lambda: FakeClient.instance.connected.add(7)).start()
+            run_worker('a', 'x', 2234, work, None, threading.Event())
+        self.assertEqual(FakeClient.instance.sent, [('server', 28, {"status": 2}), (7, 4, {})])
+
+    def test_peer_that_never_connects_is_reported(self):
+        work = queue.Queue()
+        results = queue.Queue()
+        work.put(('peer', 7, 4, {}))
+        work.put(None)
+        with mock.patch('bindo.supervisor.WorkerClient', FakeClient), \
+                mock.patch('bindo.supervisor.PEER_TIMEOUT', 0.2):
+            run_worker('a', 'x', 2234, work, results, threading.Event())
+        self.assertEqual(FakeClient.instance.sent, [])
+        self.assertEqual(results.get_nowait(), {
+            "account": "a",
+            "source": "worker",
+            "token": 7,
+            "message": {"code": "unsent", "message_code": 4}
+        })
+
+    def test_failed_login_exits_without_ready(self):
+        ready = threading.Event()
+        with mock.patch('bindo.supervisor.WorkerClient', FailedLoginClient):
+            with self.assertRaises(SystemExit):
+                run_worker('a', 'x', 2234, queue.Queue(), None, ready)
+        self.assertFalse(ready.is_set())
+
+    def test_dead_client_exits_worker(self):
+        work = queue.Queue()
+        work.put(('server', None, 28, {"status": 2}))
+        with mock.patch('bindo.supervisor.WorkerClient', DyingClient):
+            with self.assertRaises(SystemExit):
+                run_worker('a', 'x', 2234, work, None, threading.Event())
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == 'fork',
+                         'The patched client only reaches forked workers.')
+    def test_worker_failing_at_startup_raises(self):
+        supervisor = Supervisor([('a', 'x')])
+        with mock.patch('bindo.supervisor.WorkerClient.__init__', side_effect=OSError):
+            with self.assertRaises(RuntimeError):
+                supervisor.start()
+
+
+if __name__ == '__main__':
+    unittest.main()